@@ -5,90 +5,306 @@ Generates rgb_mask folders and distributes images to appropriate directories.
 """
 
 import os
+import sys
+import logging
 import cv2
 import numpy as np
-from PIL import Image
 import argparse
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
-def combine_rgb_mask(rgb_folder, mask_folder, output_folder):
+logger = logging.getLogger(__name__)
+
+
+# Image decode/encode is I/O- and codec-bound (OpenCV releases the GIL), so threads scale well
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Copies are dominated by metadata syscalls, a smaller pool is enough to overlap them
+COPY_WORKERS = 16
+# PNG encoding dominates the per-image cost, level 1 is several times faster than the default
+# at slightly larger files. RLE suits the mostly-black backgrounds of the segmented images.
+PNG_WRITE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+SEGMENTED_PNG_WRITE_PARAMS = PNG_WRITE_PARAMS + [cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE]
+PNG_EXTENSIONS = ('.png', '.PNG')
+
+# Shared by all copy helpers so the worker threads are started once per run, see _get_copy_executor
+_copy_executor = None
+
+
+def _read_image(path, flags):
     """
-    Combines RGB images with their corresponding masks to create RGBA images.
+    Read a file with a single open/read and decode it from memory.
+    
+    Returns:
+        np.ndarray or None: Decoded image, None if the data cannot be decoded (as cv2.imread)
+    """
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8), flags)
+
+
+def _discard_temp_file(path):
+    """
+    Remove a temporary file left by a failed write, so it is not listed as a frame later.
+    Errors are ignored, the failure that left it behind has already been reported.
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _write_image(path, image, params):
+    """
+    Write an image with cv2.imwrite, raising OSError if it fails. cv2.imwrite only returns
+    False, which would otherwise let a failed encode or write count as success.
+    
+    The image is written to a temporary file and renamed over path, so an existing hardlink
+    (rgb_mask, surface and segmented images share inodes after a run) is replaced rather than
+    rewritten through the shared inode, and a failed write leaves the old file intact.
+    """
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, f".tmp_{name}")
+    try:
+        if not cv2.imwrite(tmp_path, image, params):
+            raise OSError(f"cv2.imwrite failed to write {path}")
+        os.replace(tmp_path, path)
+    except Exception:
+        _discard_temp_file(tmp_path)
+        raise
+
+
+def _list_png_files(folder):
+    """
+    Return the sorted names of the PNG files in folder.
+    Uses os.scandir, whose entries carry the file type, and matches a fixed tuple of extensions
+    instead of lowercasing every name.
+    """
+    with os.scandir(folder) as entries:
+        return sorted(entry.name for entry in entries if entry.is_file() and entry.name.endswith(PNG_EXTENSIONS))
+
+
+def _list_names(folder):
+    """
+    Return the set of entry names in folder (empty if it does not exist), so that existence
+    checks for many files cost one directory listing instead of one stat per file.
+    """
+    try:
+        return set(os.listdir(folder))
+    except FileNotFoundError:
+        return set()
+
+
+def _combine_one(rgb_file, rgb_folder, mask_folder, output_folder):
+    """
+    Combine a single RGB image with its mask and save the RGBA result.
+    
+    Returns:
+        np.ndarray or None: The BGRA image, None on failure
+    """
+    # Get the base filename without extension (e.g., "000000" from "000000.png")
+    base_name = os.path.splitext(rgb_file)[0]
+    
+    # Construct the corresponding mask filename (e.g., "000000_000000.png")
+    mask_file = f"{base_name}_000000.png"
+    mask_path = os.path.join(mask_folder, mask_file)
+    
+    try:
+        # Load mask image first, a missing mask is detected by the open itself rather than an extra stat
+        try:
+            mask_image = _read_image(mask_path, cv2.IMREAD_GRAYSCALE)
+        except FileNotFoundError:
+            logger.warning(f"No corresponding mask found for {rgb_file} (looking for {mask_file})")
+            return None
+        
+        # Load RGB image, kept in OpenCV's BGR order since it is written back with cv2.imwrite
+        rgb_path = os.path.join(rgb_folder, rgb_file)
+        rgb_image = _read_image(rgb_path, cv2.IMREAD_COLOR)
+        
+        # Ensure both images have the same dimensions
+        if rgb_image.shape[:2] != mask_image.shape:
+            logger.warning(f"Size mismatch for {rgb_file}. Resizing mask to match RGB image.")
+            mask_image = cv2.resize(mask_image, (rgb_image.shape[1], rgb_image.shape[0]))
+        
+        # Create BGRA image: BGR channels + mask as alpha channel, interleaved in a single
+        # pass by mixChannels rather than two strided copies into the array. The array is kept by
+        # the caller, so it is allocated per frame (uninitialized) rather than reused.
+        rgba_image = np.empty((rgb_image.shape[0], rgb_image.shape[1], 4), dtype=np.uint8)
+        cv2.mixChannels([rgb_image, mask_image], [rgba_image], [0, 0, 1, 1, 2, 2, 3, 3])
+        
+        # Save as PNG (stored as RGBA on disk). _write_image replaces the file, so the surface
+        # images hardlinked to rgb_mask by a previous run are not rewritten through the shared inode
+        output_path = os.path.join(output_folder, f"{base_name}.png")
+        _write_image(output_path, rgba_image, PNG_WRITE_PARAMS)
+        
+        logger.debug(f"Processed: {rgb_file} + {mask_file} -> {base_name}.png")
+        return rgba_image
+        
+    except Exception as e:
+        logger.error(f"Could not process {rgb_file}: {str(e)}")
+        return None
+
+
+def combine_rgb_mask_arrays(rgb_folder, mask_folder, output_folder):
+    """
+    Combines RGB images with their corresponding masks to create RGBA images, and returns
+    the combined images so callers can reuse them without decoding the PNGs again.
     Handles the naming pattern: RGB: 000000.png, Mask: 000000_000000.png
     
     Args:
         rgb_folder (str): Path to RGB images folder
         mask_folder (str): Path to mask images folder
         output_folder (str): Path to output folder for RGBA images
+    
+    Returns:
+        dict: {base_name: rgba_image} in OpenCV's BGRA order, empty if nothing was processed
     """
     # Check if input folders exist
     if not os.path.exists(rgb_folder):
-        print(f"Error: RGB folder not found at {rgb_folder}")
-        return False
+        logger.error(f"RGB folder not found at {rgb_folder}")
+        return {}
     
     if not os.path.exists(mask_folder):
-        print(f"Error: Mask folder not found at {mask_folder}")
-        return False
+        logger.error(f"Mask folder not found at {mask_folder}")
+        return {}
     
     # Create output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
     
     # Get list of RGB images
-    rgb_files = [f for f in os.listdir(rgb_folder) if f.lower().endswith('.png')]
-    rgb_files.sort()  # Sort to ensure consistent processing order
+    rgb_files = _list_png_files(rgb_folder)  # Sorted to ensure consistent processing order
     
     if not rgb_files:
-        print("No PNG files found in RGB folder")
-        return False
+        logger.warning("No PNG files found in RGB folder")
+        return {}
     
-    processed_count = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(
+            lambda rgb_file: _combine_one(rgb_file, rgb_folder, mask_folder, output_folder), rgb_files))
     
-    for rgb_file in rgb_files:
-        # Get the base filename without extension (e.g., "000000" from "000000.png")
-        base_name = os.path.splitext(rgb_file)[0]
-        
-        # Construct the corresponding mask filename (e.g., "000000_000000.png")
-        mask_file = f"{base_name}_000000.png"
-        mask_path = os.path.join(mask_folder, mask_file)
-        
-        if not os.path.exists(mask_path):
-            print(f"Warning: No corresponding mask found for {rgb_file} (looking for {mask_file})")
-            continue
-        
+    arrays = {os.path.splitext(rgb_file)[0]: rgba_image
+              for rgb_file, rgba_image in zip(rgb_files, results) if rgba_image is not None}
+    
+    logger.info(f"Completed! Processed {len(arrays)}/{len(rgb_files)} images in {output_folder}")
+    return arrays
+
+
+def combine_rgb_mask(rgb_folder, mask_folder, output_folder):
+    """
+    Combines RGB images with their corresponding masks to create RGBA images.
+    Handles the naming pattern: RGB: 000000.png, Mask: 000000_000000.png
+    
+    Args:
+        rgb_folder (str): Path to RGB images folder
+        mask_folder (str): Path to mask images folder
+        output_folder (str): Path to output folder for RGBA images
+    
+    Returns:
+        bool: Whether any image was processed
+    """
+    return len(combine_rgb_mask_arrays(rgb_folder, mask_folder, output_folder)) > 0
+
+
+def _copy_file(source_file, dest_file):
+    """
+    Copy source_file to dest_file in the kernel with os.copy_file_range (reflink-aware on
+    Btrfs/XFS), falling back to shutil.copy2 where it is unavailable or unsupported.
+    """
+    if hasattr(os, 'copy_file_range'):
         try:
-            # Load RGB image
-            rgb_path = os.path.join(rgb_folder, rgb_file)
-            rgb_image = cv2.imread(rgb_path)
-            rgb_image = cv2.cvtColor(rgb_image, cv2.COLOR_BGR2RGB)
-            
-            # Load mask image
-            mask_image = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
-            
-            # Ensure both images have the same dimensions
-            if rgb_image.shape[:2] != mask_image.shape:
-                print(f"Warning: Size mismatch for {rgb_file}. Resizing mask to match RGB image.")
-                mask_image = cv2.resize(mask_image, (rgb_image.shape[1], rgb_image.shape[0]))
-            
-            # Create RGBA image
-            rgba_image = np.zeros((rgb_image.shape[0], rgb_image.shape[1], 4), dtype=np.uint8)
-            rgba_image[:, :, :3] = rgb_image  # RGB channels
-            rgba_image[:, :, 3] = mask_image  # Alpha channel
-            
-            # Convert to PIL Image and save as PNG
-            pil_image = Image.fromarray(rgba_image, 'RGBA')
-            output_path = os.path.join(output_folder, f"{base_name}.png")
-            pil_image.save(output_path)
-            
-            processed_count += 1
-            print(f"Processed: {rgb_file} + {mask_file} -> {base_name}.png")
-            
-        except Exception as e:
-            print(f"Error processing {rgb_file}: {str(e)}")
-            continue
+            with open(source_file, 'rb') as src, open(dest_file, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(source_file, dest_file)
+                return
+        except OSError:
+            pass  # e.g. EXDEV across filesystems on kernels before 5.3
+    shutil.copy2(source_file, dest_file)
+
+
+def _link_or_copy(source_file, dest_file):
+    """
+    Hardlink source_file to dest_file, falling back to a full copy across devices.
+    The staging tree only ever holds identical content, so a link avoids moving any bytes.
+    """
+    try:
+        os.link(source_file, dest_file)
+    except FileExistsError:
+        os.remove(dest_file)
+        _link_or_copy(source_file, dest_file)
+    except OSError:
+        _copy_file(source_file, dest_file)
+
+
+def _get_copy_executor():
+    """
+    Return the thread pool shared by the copy helpers, creating it on first use.
+    All copies of a run are submitted to the same long-lived workers instead of spinning up
+    and tearing down a pool per helper call.
+    """
+    global _copy_executor
+    if _copy_executor is None:
+        _copy_executor = ThreadPoolExecutor(max_workers=COPY_WORKERS)
+    return _copy_executor
+
+
+def distribute_images(source_folder, dest_ranges, source_name="{:06d}.png", dest_name="{:06d}.png", image_type=None):
+    """
+    Copy indexed images from one source folder to several destinations in a single pass.
+    Each source file is looked up once and copied to every destination whose range contains it,
+    instead of one pass per destination over overlapping ranges.
     
-    print(f"Completed! Processed {processed_count} images in {output_folder}")
-    return processed_count > 0
+    Args:
+        source_folder (str): Source folder containing images
+        dest_ranges (dict): {dest_folder: (start, end)} - end is exclusive
+        source_name (str): Format string for source filenames, e.g. "{:06d}_000000.png"
+        dest_name (str): Format string for destination filenames, e.g. "{:06d}.png"
+        image_type (str): Type of images being copied (for logging), e.g. "mask"
+    
+    Returns:
+        dict: {dest_folder: number of copied files}
+    """
+    for dest_folder in dest_ranges:
+        os.makedirs(dest_folder, exist_ok=True)
+    
+    indices = sorted(set().union(*(range(*image_range) for image_range in dest_ranges.values())))
+    source_names = _list_names(source_folder)
+    label = f"{image_type} " if image_type else ""
+    action = "Copied" if source_name == dest_name else "Copied and renamed"
+    
+    def _distribute_one(i):
+        """Returns (missing source file or None, destination folders the file was copied to)."""
+        source_file = os.path.join(source_folder, source_name.format(i))
+        if source_name.format(i) not in source_names:
+            return source_file, []
+        
+        dest_folders = [dest_folder for dest_folder, (start_idx, end_idx) in dest_ranges.items()
+                        if start_idx <= i < end_idx]
+        for dest_folder in dest_folders:
+            _link_or_copy(source_file, os.path.join(dest_folder, dest_name.format(i)))
+        return None, dest_folders
+    
+    # map submits every copy up front and yields results in index order, so missing files are
+    # reported here in order rather than from the worker threads
+    copied_counts = dict.fromkeys(dest_ranges, 0)
+    for missing_file, dest_folders in _get_copy_executor().map(_distribute_one, indices):
+        if missing_file is not None:
+            logger.warning(f"Source {label}file not found: {missing_file}")
+        for dest_folder in dest_folders:
+            copied_counts[dest_folder] += 1
+    
+    for dest_folder, (start_idx, end_idx) in dest_ranges.items():
+        logger.info(f"{action} {copied_counts[dest_folder]} {label}images ({start_idx:06d}-{end_idx-1:06d}) to {dest_folder}")
+    return copied_counts
 
 
 def copy_images_to_directory(source_folder, dest_folder, image_range, image_type="rgb_mask"):
@@ -101,22 +317,7 @@ def copy_images_to_directory(source_folder, dest_folder, image_range, image_type
         image_range (tuple): Range of images to copy (start, end) - end is exclusive
         image_type (str): Type of images being copied (for logging)
     """
-    os.makedirs(dest_folder, exist_ok=True)
-    
-    start_idx, end_idx = image_range
-    copied_count = 0
-    
-    for i in range(start_idx, end_idx):
-        source_file = os.path.join(source_folder, f"{i:06d}.png")
-        dest_file = os.path.join(dest_folder, f"{i:06d}.png")
-        
-        if os.path.exists(source_file):
-            shutil.copy2(source_file, dest_file)
-            copied_count += 1
-        else:
-            print(f"Warning: Source file not found: {source_file}")
-    
-    print(f"Copied {copied_count} {image_type} images ({start_idx:06d}-{end_idx-1:06d}) to {dest_folder}")
+    distribute_images(source_folder, {dest_folder: image_range}, image_type=image_type)
 
 
 def copy_and_rename_mask_images(source_folder, dest_folder, image_range):
@@ -129,22 +330,8 @@ def copy_and_rename_mask_images(source_folder, dest_folder, image_range):
         dest_folder (str): Destination folder
         image_range (tuple): Range of images to copy (start, end) - end is exclusive
     """
-    os.makedirs(dest_folder, exist_ok=True)
-    
-    start_idx, end_idx = image_range
-    copied_count = 0
-    
-    for i in range(start_idx, end_idx):
-        source_file = os.path.join(source_folder, f"{i:06d}_000000.png")
-        dest_file = os.path.join(dest_folder, f"{i:06d}.png")  # Remove _000000 suffix
-        
-        if os.path.exists(source_file):
-            shutil.copy2(source_file, dest_file)
-            copied_count += 1
-        else:
-            print(f"Warning: Source mask file not found: {source_file}")
-    
-    print(f"Copied and renamed {copied_count} mask images ({start_idx:06d}-{end_idx-1:06d}) to {dest_folder}")
+    distribute_images(source_folder, {dest_folder: image_range},
+                      source_name="{:06d}_000000.png", dest_name="{:06d}.png", image_type="mask")  # Remove _000000 suffix
 
 
 def copy_mask_images_to_directory(source_folder, dest_folder, image_range):
@@ -156,22 +343,87 @@ def copy_mask_images_to_directory(source_folder, dest_folder, image_range):
         dest_folder (str): Destination folder
         image_range (tuple): Range of images to copy (start, end) - end is exclusive
     """
-    os.makedirs(dest_folder, exist_ok=True)
+    distribute_images(source_folder, {dest_folder: image_range},
+                      source_name="{:06d}_000000.png", dest_name="{:06d}_000000.png", image_type="mask")
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _zero_background_kernel(rgba_image):
+        # Fused per-pixel sweep over (rows, W, 4), rows split across cores, no temporary mask
+        rows, width, _ = rgba_image.shape
+        for y in prange(rows):
+            for x in range(width):
+                if rgba_image[y, x, 3] < 10:
+                    rgba_image[y, x, 0] = 0
+                    rgba_image[y, x, 1] = 0
+                    rgba_image[y, x, 2] = 0
+
+
+def _zero_background(rgba_image):
+    """
+    Set the color channels of background pixels (alpha < 10) to black, in place.
+    Works on RGBA and BGRA alike since all three color channels are zeroed, and on a single
+    (H, W, 4) image as well as a stacked (N, H, W, 4) volume.
+    Uses a parallel Numba kernel when numba is installed, OpenCV's SIMD bitwise_and otherwise.
+    """
+    if rgba_image.flags.c_contiguous:
+        # Stacked frames are flattened into rows, the reshape of a contiguous array is a view
+        frames = rgba_image.reshape(-1, rgba_image.shape[-2], 4)
+        if njit is not None:
+            _zero_background_kernel(frames)
+        else:
+            # AND background pixels with (0, 0, 0, 255) in place: color is cleared, alpha kept,
+            # pixels outside the mask are left untouched. The bool mask is reused as uint8 without a copy.
+            background = (frames[:, :, 3] < 10).view(np.uint8)
+            cv2.bitwise_and(frames, (0, 0, 0, 255), dst=frames, mask=background)
+        return
     
-    start_idx, end_idx = image_range
-    copied_count = 0
+    # Non-contiguous arrays cannot be passed to the kernels in place.
+    # A 0/1 uint8 view of the threshold avoids a bool->uint8 promotion in the multiply
+    keep = (rgba_image[..., 3] >= 10).view(np.uint8)
+    rgba_image[..., :3] *= keep[..., None]
+
+
+def _load_segmented(rgba_file, segmented_images_folder):
+    """
+    Load a single segmented RGBA image for post-processing.
     
-    for i in range(start_idx, end_idx):
-        source_file = os.path.join(source_folder, f"{i:06d}_000000.png")
-        dest_file = os.path.join(dest_folder, f"{i:06d}_000000.png")
+    Returns:
+        np.ndarray or None: The image in OpenCV's BGRA order, None if it cannot be post-processed
+    """
+    try:
+        rgba_path = os.path.join(segmented_images_folder, rgba_file)
+        rgba_image = _read_image(rgba_path, cv2.IMREAD_UNCHANGED)  # Load with alpha channel
         
-        if os.path.exists(source_file):
-            shutil.copy2(source_file, dest_file)
-            copied_count += 1
-        else:
-            print(f"Warning: Source mask file not found: {source_file}")
+        if rgba_image.shape[2] != 4:
+            logger.warning(f"{rgba_file} is not RGBA format, skipping...")
+            return None
+        return rgba_image
+        
+    except Exception as e:
+        logger.error(f"Could not post-process {rgba_file}: {str(e)}")
+        return None
+
+
+def _save_segmented(rgba_file, segmented_images_folder, rgba_image):
+    """
+    Save a post-processed segmented image back to its original path.
     
-    print(f"Copied {copied_count} mask images ({start_idx:06d}-{end_idx-1:06d}) to {dest_folder}")
+    Returns:
+        bool: Whether the image was saved
+    """
+    # _write_image replaces the file, so a hardlinked source (e.g. rgb_mask or surface images)
+    # is not modified through the shared inode
+    try:
+        _write_image(os.path.join(segmented_images_folder, rgba_file), rgba_image, SEGMENTED_PNG_WRITE_PARAMS)
+        
+        logger.debug(f"Post-processed: {rgba_file} (set background to black using alpha channel)")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Could not post-process {rgba_file}: {str(e)}")
+        return False
 
 
 def postprocess_segmented_images(segmented_images_folder):
@@ -182,54 +434,89 @@ def postprocess_segmented_images(segmented_images_folder):
     Args:
         segmented_images_folder (str): Path to segmented images folder containing RGBA images
     """
-    print(f"\nPost-processing segmented images in: {segmented_images_folder}")
+    logger.info(f"Post-processing segmented images in: {segmented_images_folder}")
     
     if not os.path.exists(segmented_images_folder):
-        print(f"Error: Segmented images folder not found: {segmented_images_folder}")
+        logger.error(f"Segmented images folder not found: {segmented_images_folder}")
         return False
     
     # Get list of RGBA images
-    rgba_files = [f for f in os.listdir(segmented_images_folder) if f.lower().endswith('.png')]
-    rgba_files.sort()
+    rgba_files = _list_png_files(segmented_images_folder)
     
     if not rgba_files:
-        print("No PNG files found in segmented images folder")
+        logger.warning("No PNG files found in segmented images folder")
         return False
     
-    processed_count = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        images = list(executor.map(lambda rgba_file: _load_segmented(rgba_file, segmented_images_folder), rgba_files))
+        loaded = [(rgba_file, image) for rgba_file, image in zip(rgba_files, images) if image is not None]
+        
+        # Use alpha channel to set background pixels to black, keep alpha unchanged. Frames of an
+        # object share their size, so the whole batch is processed as one stacked volume.
+        if loaded and len({image.shape for _, image in loaded}) == 1:
+            volume = np.stack([image for _, image in loaded])
+            _zero_background(volume)
+            loaded = [(rgba_file, image) for (rgba_file, _), image in zip(loaded, volume)]
+        else:
+            for _, image in loaded:
+                _zero_background(image)
+        
+        results = list(executor.map(
+            lambda item: _save_segmented(item[0], segmented_images_folder, item[1]), loaded))
+    
+    processed_count = sum(results)
     
-    for rgba_file in rgba_files:
+    logger.info(f"Post-processing completed! Modified {processed_count}/{len(rgba_files)} segmented images.")
+    return processed_count > 0
+
+
+def write_segmented(arrays, dest_folder, image_range, postprocess=True):
+    """
+    Write segmented images directly from in-memory RGBA arrays, avoiding a copy of the
+    rgb_mask PNGs followed by a decode/re-encode in postprocess_segmented_images.
+    
+    Args:
+        arrays (dict): {base_name: rgba_image} in OpenCV's BGRA order, as returned by
+            combine_rgb_mask_arrays, arrays are modified in place when postprocess is set
+        dest_folder (str): Destination folder
+        image_range (tuple): Range of images to write (start, end) - end is exclusive
+        postprocess (bool): Set background pixels (alpha < 10) to black before writing
+    """
+    os.makedirs(dest_folder, exist_ok=True)
+    
+    start_idx, end_idx = image_range
+    
+    # Zero the backgrounds here rather than in the writer threads, the Numba kernel is itself
+    # parallel and must not be launched from several threads at once
+    if postprocess:
+        for i in range(start_idx, end_idx):
+            rgba_image = arrays.get(f"{i:06d}")
+            if rgba_image is not None:
+                _zero_background(rgba_image)
+    
+    def _write_one(i):
+        base_name = f"{i:06d}"
+        rgba_image = arrays.get(base_name)
+        if rgba_image is None:
+            logger.warning(f"No rgb_mask image available for {base_name}")
+            return False
+        
+        # _write_image replaces the file, so an existing hardlink from a previous run is not modified
         try:
-            # Load RGBA image
-            rgba_path = os.path.join(segmented_images_folder, rgba_file)
-            rgba_image = cv2.imread(rgba_path, cv2.IMREAD_UNCHANGED)  # Load with alpha channel
-            
-            if rgba_image.shape[2] != 4:
-                print(f"Warning: {rgba_file} is not RGBA format, skipping...")
-                continue
-            
-            # Use alpha channel to create background mask
-            alpha_channel = rgba_image[:, :, 3]
-            background_mask = alpha_channel < 10  # Threshold for background detection
-            
-            # Set RGB channels to black for background pixels, keep alpha unchanged
-            rgba_image[background_mask, 0] = 0  # Blue channel (OpenCV uses BGR)
-            rgba_image[background_mask, 1] = 0  # Green channel
-            rgba_image[background_mask, 2] = 0  # Red channel
-            # Alpha channel (index 3) remains unchanged
-            
-            # Save the modified RGBA image
-            cv2.imwrite(rgba_path, rgba_image)
-            
-            processed_count += 1
-            print(f"Post-processed: {rgba_file} (set background to black using alpha channel)")
+            _write_image(os.path.join(dest_folder, f"{base_name}.png"), rgba_image, SEGMENTED_PNG_WRITE_PARAMS)
+            return True
             
         except Exception as e:
-            print(f"Error post-processing {rgba_file}: {str(e)}")
-            continue
+            logger.error(f"Could not write segmented image {base_name}.png: {str(e)}")
+            return False
     
-    print(f"Post-processing completed! Modified {processed_count} segmented images.")
-    return processed_count > 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(_write_one, range(start_idx, end_idx)))
+    
+    written_count = sum(results)
+    logger.info(f"Wrote {written_count} segmented images ({start_idx:06d}-{end_idx-1:06d}) to {dest_folder}"
+                 f"{' with black backgrounds' if postprocess else ''}")
+    return written_count > 0
 
 
 def process_object_directory(obj_path):
@@ -239,7 +526,7 @@ def process_object_directory(obj_path):
     Args:
         obj_path (str): Path to the object directory (e.g., "obj_000003")
     """
-    print(f"\nProcessing object directory: {obj_path}")
+    logger.info(f"Processing object directory: {obj_path}")
     
     # Define the base paths
     train_pbr_path = os.path.join(obj_path, "train_pbr")
@@ -248,7 +535,7 @@ def process_object_directory(obj_path):
     
     # Check if the required directories exist
     if not os.path.exists(base_000000_path):
-        print(f"Error: Base directory not found: {base_000000_path}")
+        logger.error(f"Base directory not found: {base_000000_path}")
         return False
     
     # Define source folders
@@ -257,9 +544,10 @@ def process_object_directory(obj_path):
     
     # Create rgb_mask folder in 000000 (generate once)
     rgb_mask_000000 = os.path.join(base_000000_path, "rgb_mask")
-    print(f"Creating rgb_mask in: {rgb_mask_000000}")
-    if not combine_rgb_mask(rgb_folder, mask_folder, rgb_mask_000000):
-        print(f"Failed to create rgb_mask in {rgb_mask_000000}")
+    logger.info(f"Creating rgb_mask in: {rgb_mask_000000}")
+    rgba_arrays = combine_rgb_mask_arrays(rgb_folder, mask_folder, rgb_mask_000000)
+    if not rgba_arrays:
+        logger.error(f"Failed to create rgb_mask in {rgb_mask_000000}")
         return False
     
     # Create necessary vggt directory structure
@@ -271,26 +559,22 @@ def process_object_directory(obj_path):
     surface_images = os.path.join(surface_path, "images")
     surface_masks = os.path.join(surface_path, "masks")
     
-    # Copy and rename original mask files to masks folders (not rgb_mask images)
-    print(f"Copying original mask files to: {segmented_masks}")
-    copy_and_rename_mask_images(mask_folder, segmented_masks, (0, 30))
-    
-    print(f"Copying original mask files to: {surface_masks}")
-    copy_and_rename_mask_images(mask_folder, surface_masks, (0, 20))
+    # Copy and rename original mask files to masks folders (not rgb_mask images),
+    # removing the _000000 suffix, in one pass over the shared 0-19 range
+    logger.info(f"Copying original mask files to: {segmented_masks}, {surface_masks}")
+    distribute_images(mask_folder, {segmented_masks: (0, 30), surface_masks: (0, 20)},
+                      source_name="{:06d}_000000.png", image_type="mask")
     
     # Distribute rgb_mask images according to specifications
     # Surface: images 0-19 (20 images)
-    print("\nDistributing surface images...")
+    logger.info("Distributing surface images...")
     copy_images_to_directory(rgb_mask_000000, surface_images, (0, 20), "rgb_mask")
     
-    # Segmented: images 0-29 (30 images)  
-    print("\nDistributing segmented images...")
-    copy_images_to_directory(rgb_mask_000000, segmented_images, (0, 30), "rgb_mask")
+    # Segmented: images 0-29 (30 images), written from the cached arrays with black backgrounds
+    logger.info("Distributing segmented images...")
+    write_segmented(rgba_arrays, segmented_images, (0, 30), postprocess=True)
     
-    # Post-process segmented images to set background to black
-    postprocess_segmented_images(segmented_images)
-    
-    print(f"Successfully processed: {obj_path}")
+    logger.info(f"Successfully processed: {obj_path}")
     return True
 
 
@@ -300,6 +584,9 @@ def main():
     
     args = parser.parse_args()
     
+    # Per-file messages are logged at DEBUG, only warnings and per-step summaries are shown
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s", stream=sys.stdout)
+    
     if not os.path.exists(args.obj_path):
         print(f"Error: Object path {args.obj_path} does not exist")
         return